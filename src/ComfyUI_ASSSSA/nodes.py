@@ -1,11 +1,350 @@
-import datetime
+import collections
+import contextlib
+import itertools
 import logging
 import os
 import re
-import subprocess
+from pathlib import Path
+from typing import Optional
 
 import folder_paths
 
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+# ASS override blocks like {\b1} or {\pos(10,20)}
+_ASS_FMT_RE = re.compile(r"\{\\[^}]*\}")
+# The byte patterns below treat \n, \r\n and a lone \r alike as line endings
+# [Section] header lines
+_ASS_SECTION_RE = re.compile(
+    rb"(?:^|(?<=[\r\n]))[ \t]*\[([^\r\n]*)\][ \t]*(?=[\r\n]|\Z)"
+)
+# Dialogue lines, capturing the Style (4th) and Text (10th) fields
+_ASS_DIALOGUE_RE = re.compile(
+    rb"(?:^|(?<=[\r\n]))[ \t]*Dialogue:[ \t]*"
+    rb"(?:[^,\r\n]*,){3}([^,\r\n]*),(?:[^,\r\n]*,){5}([^\r\n]*)"
+)
+# Style lines, without surrounding whitespace
+_ASS_STYLE_RE = re.compile(
+    rb"(?:^|(?<=[\r\n]))[ \t]*(Style:[^\r\n]*?)[ \t]*(?=[\r\n]|\Z)"
+)
+
+# Map x264-style preset names onto the NVENC p1 (fastest) .. p7 (slowest) scale
+_NVENC_PRESETS = {
+    "ultrafast": "p1",
+    "superfast": "p1",
+    "veryfast": "p2",
+    "faster": "p3",
+    "fast": "p3",
+    "medium": "p4",
+    "slow": "p5",
+    "slower": "p6",
+    "veryslow": "p7",
+}
+
+
+def _validate_transcode(video_path, settings) -> Optional[str]:
+    """Check inputs before spawning ffmpeg, returning an error message or None."""
+    if not os.path.exists(video_path):
+        return f"Video file '{video_path}' not found"
+    formats = _CODEC_CONTAINER_OK.get(settings["codec"])
+    if formats is not None and settings["format"] not in formats:
+        return f"Codec '{settings['codec']}' is not supported in {settings['format']} container"
+    return None
+
+
+def _ff_filter_quote(path):
+    """Quote a file path for use as a filter option value inside -vf."""
+    # Forward slashes work on every platform and need no escaping
+    path = path.replace("\\", "/")
+    # Escape for the filter option parser, then quote for the filtergraph parser
+    value = path.replace("'", "\\'").replace(":", "\\:")
+    return "'" + value.replace("'", "'\\''") + "'"
+
+
+# Common ffmpeg prefix: quiet logging, overwrite existing outputs
+_FFMPEG_CMD = ("ffmpeg", "-hide_banner", "-nostats", "-loglevel", "error", "-y")
+
+
+_executables = {}
+
+
+def _find_executable(name):
+    """Resolve an FFmpeg executable on PATH, once per process."""
+    import shutil
+
+    if name not in _executables:
+        path = shutil.which(name)
+        if path is None:
+            raise FileNotFoundError(
+                f"{name} not found, make sure FFmpeg is installed and on PATH"
+            )
+        _executables[name] = path
+    return _executables[name]
+
+
+def _run_ffmpeg(cmd):
+    """Run ffmpeg, streaming stderr to the log instead of buffering it.
+
+    Returns the exit code and, on failure, the last few stderr lines.
+    Output is kept as bytes and only decoded when it is actually needed.
+    """
+    import subprocess
+
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    tail = collections.deque(maxlen=20)
+    with subprocess.Popen(
+        cmd,
+        executable=_find_executable(cmd[0]),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    ) as process:
+        for line in process.stderr:
+            line = line.rstrip()
+            if debug:
+                logging.debug(line.decode("utf-8", errors="replace"))
+            tail.append(line)
+        returncode = process.wait()
+    if returncode != 0:
+        return returncode, b"\n".join(tail).decode("utf-8", errors="replace")
+    return returncode, ""
+
+
+def _split_params(params):
+    """Split additional ffmpeg parameters the way a POSIX shell would.
+
+    Backslashes are escape characters here, so Windows paths need forward
+    slashes or single quotes.
+    """
+    import shlex
+
+    return shlex.split(params)
+
+
+def _hwaccel_options(settings):
+    """Input (flag, value) pairs selecting hardware decoding for the given settings."""
+    if settings["codec"] == "copy":
+        return []
+    if settings["codec"].endswith("_nvenc"):
+        # Keep decoded frames in device memory so NVENC reads them directly
+        return [("-hwaccel", "cuda"), ("-hwaccel_output_format", "cuda")]
+    hwaccel = settings.get("hwaccel", "none")
+    if hwaccel != "none":
+        return [("-hwaccel", hwaccel)]
+    return []
+
+
+def _video_encode_options(settings, scale=True):
+    """Output (flag, value) pairs for re-encoding the video stream.
+
+    Pass scale=False when the caller already scales in its own filter chain.
+    """
+    nvenc = settings["codec"].endswith("_nvenc")
+    options = [("-c:v", settings["codec"])]
+    if scale and settings["resolution"] != "source":
+        if nvenc:
+            options.append(
+                ("-vf", f"scale_cuda={settings['resolution'].replace('x', ':')}")
+            )
+        else:
+            options.append(("-vf", f"scale={settings['resolution']}"))
+    if settings["framerate"] != "source":
+        options.append(("-r", settings["framerate"]))
+    if settings["preset"]:
+        if nvenc:
+            options.append(
+                ("-preset", _NVENC_PRESETS.get(settings["preset"], settings["preset"]))
+            )
+        else:
+            options.append(("-preset", settings["preset"]))
+    if settings["crf"]:
+        if nvenc:
+            # NVENC caps -cq at its default 2M average bitrate unless -b:v is 0
+            options += [("-rc", "vbr"), ("-cq", str(settings["crf"])), ("-b:v", "0")]
+        else:
+            options.append(("-crf", str(settings["crf"])))
+    return options
+
+
+def _audio_encode_options(settings):
+    """Output (flag, value) pairs for the audio stream."""
+    if settings["audio_codec"] == "copy":
+        return [("-c:a", "copy")]
+    options = [("-c:a", settings["audio_codec"])]
+    if settings["audio_bitrate"] != "source":
+        options.append(("-b:a", settings["audio_bitrate"]))
+    return options
+
+
+_FFMPEG_SETTINGS_INPUT_TYPES = {
+    "required": {
+        "format": (
+            [
+                "mp4",
+                "mkv",
+                "mov",
+                "avi",
+                "webm",
+                "gif",
+                "flv",
+                "wmv",
+                "ts",
+                "mxf",
+            ],
+            {"default": "mkv", "tooltip": "Output container format"},
+        ),
+        "codec": (
+            [
+                "copy",  # Copy codec from source
+                "libx264",
+                "libx265",
+                "libvpx-vp9",
+                "libvpx",
+                "prores_ks",
+                "dnxhd",
+                "av1",
+                "h264_nvenc",
+                "hevc_nvenc",
+                "h264_videotoolbox",
+                "hevc_videotoolbox",
+                "prores_videotoolbox",
+                "libaom-av1",
+                "libsvtav1",
+                "mpeg2video",
+                "mpeg4",
+            ],
+            {
+                "default": "copy",
+                "tooltip": "Video codec to use for encoding, use 'copy' to keep source codec.",
+            },
+        ),
+        "resolution": (
+            "STRING",
+            {
+                "default": "source",
+                "multiline": False,
+                "tooltip": "Output resolution in format WIDTHxHEIGHT or 'source' to keep original resolution",
+            },
+        ),
+        "framerate": (
+            "STRING",
+            {
+                "default": "source",
+                "multiline": False,
+                "tooltip": "Target frame rate or 'source' to keep original",
+            },
+        ),
+        "preset": (
+            [
+                "ultrafast",
+                "superfast",
+                "veryfast",
+                "faster",
+                "fast",
+                "medium",
+                "slow",
+                "slower",
+                "veryslow",
+            ],
+            {
+                "default": "medium",
+                "tooltip": "Encoding preset (speed vs quality tradeoff)",
+            },
+        ),
+        "crf": (
+            "INT",
+            {
+                "default": 23,
+                "min": 0,
+                "max": 51,
+                "step": 1,
+                "tooltip": "Constant Rate Factor: lower values = higher quality",
+            },
+        ),
+    },
+    "optional": {
+        "audio_codec": (
+            [
+                "copy",
+                "aac",
+                "mp3",
+                "opus",
+                "flac",
+                "none",
+                "vorbis",
+                "ac3",
+                "eac3",
+                "libfdk_aac",
+                "pcm_s16le",
+                "pcm_s24le",
+                "pcm_f32le",
+            ],
+            {
+                "default": "copy",
+                "tooltip": "Audio codec to use for encoding, use 'copy' to keep source codec",
+            },
+        ),
+        "audio_bitrate": (
+            [
+                "source",
+                "64k",
+                "96k",
+                "128k",
+                "160k",
+                "192k",
+                "224k",
+                "256k",
+                "320k",
+                "384k",
+                "448k",
+                "512k",
+            ],
+            {
+                "default": "source",
+                "tooltip": "Audio bitrate for encoding or 'source' to maintain original",
+            },
+        ),
+        "additional_params": (
+            "STRING",
+            {
+                "default": "",
+                "multiline": True,
+                "tooltip": "Additional FFmpeg parameters (advanced), split like a shell command line: quote arguments with spaces, write Windows paths with forward slashes or in single quotes",
+            },
+        ),
+        "hwaccel": (
+            ["none", "cuda", "videotoolbox", "qsv", "vaapi"],
+            {
+                "default": "none",
+                "tooltip": "Hardware accelerated decoding, NVENC codecs always decode with cuda",
+            },
+        ),
+    },
+}
+
+
+# Containers accepted by codecs with restricted container support.
+# Codecs not listed here are not checked.
+_VIDEO_FORMATS = set(_FFMPEG_SETTINGS_INPUT_TYPES["required"]["format"][0])
+_H264_FORMATS = _VIDEO_FORMATS - {"webm", "gif"}
+# MXF has no HEVC mapping, and FLV only muxes HEVC since FFmpeg 6.1
+_HEVC_FORMATS = _H264_FORMATS - {"mxf", "flv"}
+_CODEC_CONTAINER_OK = {
+    "libx264": _H264_FORMATS,
+    "h264_nvenc": _H264_FORMATS,
+    "h264_videotoolbox": _H264_FORMATS,
+    "libx265": _HEVC_FORMATS,
+    "hevc_nvenc": _HEVC_FORMATS,
+    "hevc_videotoolbox": _HEVC_FORMATS,
+    "libvpx": {"webm", "mkv", "avi"},
+    "libvpx-vp9": {"webm", "mkv", "mp4"},
+    "prores_ks": {"mov", "mkv", "mxf"},
+    "prores_videotoolbox": {"mov", "mkv", "mxf"},
+    "dnxhd": {"mov", "mkv", "mxf", "avi"},
+}
+
 
 class FFMpegSettingsNode:
     def __init__(self):
@@ -19,148 +358,12 @@ class FFMpegSettingsNode:
             "preset": "medium",
             "crf": "23",
             "additional_params": "",
+            "hwaccel": "none",
         }
 
     @classmethod
     def INPUT_TYPES(s):
-        return {
-            "required": {
-                "format": (
-                    [
-                        "mp4",
-                        "mkv",
-                        "mov",
-                        "avi",
-                        "webm",
-                        "gif",
-                        "flv",
-                        "wmv",
-                        "ts",
-                        "mxf",
-                    ],
-                    {"default": "mkv", "tooltip": "Output container format"},
-                ),
-                "codec": (
-                    [
-                        "copy",  # Copy codec from source
-                        "libx264",
-                        "libx265",
-                        "libvpx-vp9",
-                        "libvpx",
-                        "prores_ks",
-                        "dnxhd",
-                        "av1",
-                        "h264_nvenc",
-                        "hevc_nvenc",
-                        "h264_videotoolbox",
-                        "hevc_videotoolbox",
-                        "prores_videotoolbox",
-                        "libaom-av1",
-                        "libsvtav1",
-                        "mpeg2video",
-                        "mpeg4",
-                    ],
-                    {
-                        "default": "copy",
-                        "tooltip": "Video codec to use for encoding, use 'copy' to keep source codec.",
-                    },
-                ),
-                "resolution": (
-                    "STRING",
-                    {
-                        "default": "source",
-                        "multiline": False,
-                        "tooltip": "Output resolution in format WIDTHxHEIGHT or 'source' to keep original resolution",
-                    },
-                ),
-                "framerate": (
-                    "STRING",
-                    {
-                        "default": "source",
-                        "multiline": False,
-                        "tooltip": "Target frame rate or 'source' to keep original",
-                    },
-                ),
-                "preset": (
-                    [
-                        "ultrafast",
-                        "superfast",
-                        "veryfast",
-                        "faster",
-                        "fast",
-                        "medium",
-                        "slow",
-                        "slower",
-                        "veryslow",
-                    ],
-                    {
-                        "default": "medium",
-                        "tooltip": "Encoding preset (speed vs quality tradeoff)",
-                    },
-                ),
-                "crf": (
-                    "INT",
-                    {
-                        "default": 23,
-                        "min": 0,
-                        "max": 51,
-                        "step": 1,
-                        "tooltip": "Constant Rate Factor: lower values = higher quality",
-                    },
-                ),
-            },
-            "optional": {
-                "audio_codec": (
-                    [
-                        "copy",
-                        "aac",
-                        "mp3",
-                        "opus",
-                        "flac",
-                        "none",
-                        "vorbis",
-                        "ac3",
-                        "eac3",
-                        "libfdk_aac",
-                        "pcm_s16le",
-                        "pcm_s24le",
-                        "pcm_f32le",
-                    ],
-                    {
-                        "default": "copy",
-                        "tooltip": "Audio codec to use for encoding, use 'copy' to keep source codec",
-                    },
-                ),
-                "audio_bitrate": (
-                    [
-                        "source",
-                        "64k",
-                        "96k",
-                        "128k",
-                        "160k",
-                        "192k",
-                        "224k",
-                        "256k",
-                        "320k",
-                        "384k",
-                        "448k",
-                        "512k",
-                    ],
-                    {
-                        "default": "source",
-                        "tooltip": "Audio bitrate for encoding or 'source' to maintain original",
-                    },
-                ),
-                "additional_params": (
-                    "STRING",
-                    {
-                        "default": "",
-                        "multiline": True,
-                        "tooltip": "Additional FFmpeg parameters (advanced)",
-                    },
-                ),
-            },
-        }
+        return _FFMPEG_SETTINGS_INPUT_TYPES
 
     RETURN_TYPES = ("FFMPEG_SETTINGS",)
     RETURN_NAMES = ("settings",)
@@ -179,6 +382,7 @@ class FFMpegSettingsNode:
         audio_codec="copy",
         audio_bitrate="192k",
         additional_params="",
+        hwaccel="none",
     ):
         settings = {
             "format": format,
@@ -190,27 +394,34 @@ class FFMpegSettingsNode:
             "audio_codec": audio_codec,
             "audio_bitrate": audio_bitrate,
             "additional_params": additional_params.strip() if additional_params else "",
+            "hwaccel": hwaccel,
         }
         return (settings,)
 
 
+_VIDEO_TRANSCODING_INPUT_TYPES = {
+    "required": {
+        "video_path": ("STRING", {"multiline": False, "default": "input.mp4"}),
+        "filename_prefix": (
+            "STRING",
+            {
+                "multiline": False,
+                "default": "video/transcoded",
+                "tooltip": "Prefix for the output video file",
+            },
+        ),
+        "settings": ("FFMPEG_SETTINGS",),
+    }
+}
+
+
 class VideoTranscodingNode:
+    def __init__(self):
+        self._out_dir = Path(folder_paths.get_output_directory())
+
     @classmethod
     def INPUT_TYPES(s):
-        return {
-            "required": {
-                "video_path": ("STRING", {"multiline": False, "default": "input.mp4"}),
-                "filename_prefix": (
-                    "STRING",
-                    {
-                        "multiline": False,
-                        "default": "video/transcoded",
-                        "tooltip": "Prefix for the output video file",
-                    },
-                ),
-                "settings": ("FFMPEG_SETTINGS",),
-            }
-        }
+        return _VIDEO_TRANSCODING_INPUT_TYPES
 
     RETURN_TYPES = ("STRING",)
     RETURN_NAMES = ("output_path",)
@@ -219,67 +430,58 @@ class VideoTranscodingNode:
     CATEGORY = "ComfyUI_ASSSSA"
     DESCRIPTION = "Transcode video using FFmpeg settings"
 
-    def transcode_video(self, video_path, filename_prefix, settings):
-        video_basename = os.path.splitext(os.path.basename(video_path))[0]
-        if filename_prefix.strip() == "":
-            output_path = os.path.join(
-                folder_paths.get_output_directory(),
-                f"{video_basename}.{settings['format']}",
-            )
-        else:
-            output_path = os.path.join(
-                folder_paths.get_output_directory(),
-                f"{filename_prefix}_{video_basename}{settings['format']}",
-            )
-        if not os.path.exists(os.path.dirname(output_path)):
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-        if not os.path.exists(video_path):
-            logging.error("Error: Input file '{video_path}' not found")
+    def transcode_video(
+        self, video_path, filename_prefix, settings, threads=0, output_stem=None
+    ):
+        video_basename = output_stem or Path(video_path).stem
+        prefix = f"{filename_prefix}_" if filename_prefix.strip() else ""
+        output_file = self._out_dir / f"{prefix}{video_basename}.{settings['format']}"
+        output_path = str(output_file)
+
+        error = _validate_transcode(video_path, settings)
+        if error:
+            logging.error(f"Error: {error}")
             return (output_path,)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
 
         try:
-            cmd = [
-                "ffmpeg",
-                "-y",
-                "-i",
-                video_path,
-            ]
-
-            if settings["codec"] != "copy":
-                cmd += ["-c:v", settings["codec"]]
-                # Only apply these settings when not copying
-                if settings["resolution"] != "source":
-                    cmd += ["-vf", f"scale={settings['resolution']}"]
-                if settings["framerate"] != "source":
-                    cmd += ["-r", settings["framerate"]]
-                if settings["preset"]:
-                    cmd += ["-preset", settings["preset"]]
-                if settings["crf"]:
-                    cmd += ["-crf", str(settings["crf"])]
+            options = _hwaccel_options(settings)
+            options.append(("-i", video_path))
+
+            if settings["codec"] == "copy" and settings["audio_codec"] == "copy":
+                # Pure remux, only the container changes
+                if settings["format"] == "mkv":
+                    # Matroska takes any stream, so carry all of them over
+                    options += [("-map", "0"), ("-c", "copy")]
+                else:
+                    options += [("-c:v", "copy"), ("-c:a", "copy")]
+                options.append(("-avoid_negative_ts", "make_zero"))
+                if settings["format"] in ("mp4", "mov"):
+                    # Put the moov atom first so players can start without a second pass
+                    options.append(("-movflags", "+faststart"))
             else:
-                cmd += ["-c:v", "copy"]
+                if settings["codec"] != "copy":
+                    # Only apply these settings when not copying
+                    options += _video_encode_options(settings)
+                else:
+                    options.append(("-c:v", "copy"))
+                options += _audio_encode_options(settings)
 
-            if settings["audio_codec"] != "copy":
-                cmd += ["-c:a", settings["audio_codec"]]
-                if settings["audio_bitrate"] != "source":
-                    cmd += ["-b:a", settings["audio_bitrate"]]
-            else:
-                cmd += ["-c:a", "copy"]
+            if threads:
+                options.append(("-threads", str(threads)))
 
+            cmd = list(_FFMPEG_CMD)
+            cmd.extend(itertools.chain.from_iterable(options))
             if settings["additional_params"]:
-                cmd += settings["additional_params"].split()
-
+                cmd += _split_params(settings["additional_params"])
             cmd.append(output_path)
 
             full_cmd = " ".join(cmd)
             logging.info(f"Running command: {full_cmd}")
-            process = subprocess.run(
-                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-            )
+            returncode, stderr = _run_ffmpeg(cmd)
 
-            if process.returncode != 0:
-                logging.error(f"FFmpeg error: {process.stderr}")
+            if returncode != 0:
+                logging.error(f"FFmpeg error: {stderr}")
                 return (output_path,)
             else:
                 logging.info(f"Video transcoded to: {output_path}")
@@ -289,25 +491,112 @@ class VideoTranscodingNode:
             return (output_path,)
 
 
+_BATCH_VIDEO_TRANSCODING_INPUT_TYPES = {
+    "required": {
+        "video_paths": (
+            "STRING",
+            {
+                "multiline": True,
+                "default": "input.mp4",
+                "tooltip": "Input video paths, one per line",
+            },
+        ),
+        "filename_prefix": (
+            "STRING",
+            {
+                "multiline": False,
+                "default": "video/transcoded",
+                "tooltip": "Prefix for the output video files",
+            },
+        ),
+        "settings": ("FFMPEG_SETTINGS",),
+        "max_parallel": (
+            "INT",
+            {
+                "default": 2,
+                "min": 1,
+                "max": 32,
+                "step": 1,
+                "tooltip": "Number of videos to transcode at the same time",
+            },
+        ),
+    }
+}
+
+
+class BatchVideoTranscodingNode(VideoTranscodingNode):
+    @classmethod
+    def INPUT_TYPES(s):
+        return _BATCH_VIDEO_TRANSCODING_INPUT_TYPES
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("output_paths",)
+    FUNCTION = "transcode_videos"
+    OUTPUT_NODE = True
+    CATEGORY = "ComfyUI_ASSSSA"
+    DESCRIPTION = "Transcode several videos in parallel using FFmpeg settings"
+
+    def transcode_videos(self, video_paths, filename_prefix, settings, max_parallel=2):
+        from concurrent.futures import ThreadPoolExecutor
+
+        paths = [path.strip() for path in video_paths.splitlines() if path.strip()]
+        if not paths:
+            logging.error("Error: No input video paths given")
+            return ("",)
+
+        # Inputs sharing a name, like a/clip.mp4 and b/clip.mp4, would write the
+        # same output file, so number the repeats: clip, clip_1, clip_2, ...
+        stems = []
+        used = set()
+        for path in paths:
+            base = stem = Path(path).stem
+            index = 0
+            while stem.casefold() in used:
+                index += 1
+                stem = f"{base}_{index}"
+            used.add(stem.casefold())
+            stems.append(stem)
+
+        max_parallel = max(1, min(max_parallel, len(paths)))
+        # Give each ffmpeg process a fair share of the cores
+        threads = max(1, (os.cpu_count() or 1) // max_parallel)
+
+        # The encoding happens in ffmpeg child processes, threads only wait on them
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            output_paths = executor.map(
+                lambda path, stem: self.transcode_video(
+                    path, filename_prefix, settings, threads=threads, output_stem=stem
+                )[0],
+                paths,
+                stems,
+            )
+            return ("\n".join(output_paths),)
+
+
+_SUBTITLE_EXTRACTION_INPUT_TYPES = {
+    "required": {
+        "video_path": ("STRING", {"multiline": False, "default": "video.mp4"}),
+        "stream": (
+            "INT",
+            {
+                "default": 0,
+                "min": 0,
+                "max": 100,
+                "step": 1,
+                "tooltip": "Subtitle stream index to extract (0 for first stream)",
+            },
+        ),
+    }
+}
+
+
 class SubtitleExtractionNode:
+    def __init__(self):
+        self._out_dir = Path(folder_paths.get_output_directory())
 
     @classmethod
     def INPUT_TYPES(s):
-        return {
-            "required": {
-                "video_path": ("STRING", {"multiline": False, "default": "video.mp4"}),
-                "stream": (
-                    "INT",
-                    {
-                        "default": 0,
-                        "min": 0,
-                        "max": 100,
-                        "step": 1,
-                        "tooltip": "Subtitle stream index to extract (0 for first stream)",
-                    },
-                ),
-            }
-        }
+        return _SUBTITLE_EXTRACTION_INPUT_TYPES
 
     RETURN_TYPES = ("STRING",)
     RETURN_NAMES = ("output_path",)
@@ -317,11 +606,10 @@ class SubtitleExtractionNode:
     DESCRIPTION = "Extract subtitles from video file"
 
     def extract_subtitles(self, video_path, stream=0):
-        video_basename = os.path.splitext(os.path.basename(video_path))[0]
+        import subprocess
+
         # Create output path with video name included
-        output_path = os.path.join(
-            folder_paths.get_output_directory(), f"{video_basename}"
-        )
+        output_path = str(self._out_dir / Path(video_path).stem)
         if not os.path.exists(video_path):
             logging.error(f"Error: Video file '{video_path}' not found")
             return (output_path,)
@@ -335,53 +623,58 @@ class SubtitleExtractionNode:
             "-show_entries",
             "stream=index,codec_name,codec_type,codec_tag_string",
             "-of",
-            "default=noprint_wrappers=1",
+            "json",
             video_path,
         ]
         try:
             logging.info(f"Running command: {check_cmd}")
             process = subprocess.run(
-                check_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+                check_cmd,
+                executable=_find_executable(check_cmd[0]),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
             )
             if process.returncode != 0:
-                logging.error(f"FFprobe error: {process.stderr}")
+                logging.error(
+                    f"FFprobe error: {process.stderr.decode('utf-8', errors='replace')}"
+                )
                 return (output_path,)
-            else:
-                # get index and codec_name from output
-                subtitle_streams = []
-                for line in process.stdout.splitlines():
-                    if line.startswith("index="):
-                        index = line.split("=")[1].strip()
-                    elif line.startswith("codec_name="):
-                        codec_name = line.split("=")[1].strip()
-                        subtitle_streams.append((index, codec_name))
-                if not subtitle_streams:
-                    logging.error("No subtitle streams found in the video file.")
-                    return (output_path,)
-                else:
-                    output_path += f".{subtitle_streams[stream][1]}"
-        except subprocess.CalledProcessError:
-            logging.error(f"Error checking subtitle streams: {process.stderr}")
+            # Map actual stream index to codec_name, in subtitle stream order
+            subtitle_streams = {
+                s["index"]: s.get("codec_name", "")
+                for s in _json.loads(process.stdout).get("streams", [])
+                if s.get("codec_type") == "subtitle"
+            }
+        except (OSError, ValueError) as e:
+            logging.error(f"Error checking subtitle streams: {str(e)}")
+            return (output_path,)
+        if not subtitle_streams:
+            logging.error("No subtitle streams found in the video file.")
             return (output_path,)
+        if stream >= len(subtitle_streams):
+            logging.error(
+                f"Error: Subtitle stream {stream} not found, "
+                f"the video has {len(subtitle_streams)} subtitle streams"
+            )
+            return (output_path,)
+        index, codec_name = list(subtitle_streams.items())[stream]
+        output_path += f".{codec_name}"
 
         cmd = [
-            "ffmpeg",
-            "-y",
+            *_FFMPEG_CMD,
             "-i",
             video_path,
             "-map",
-            f"0:s:{stream}",  # Map the first subtitle stream
+            f"0:{index}",  # Map the selected subtitle stream
             f"{output_path}",
         ]
         try:
 
             full_cmd = " ".join(cmd)
             logging.info(f"Running command: {full_cmd}")
-            process = subprocess.run(
-                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-            )
-            if process.returncode != 0:
-                logging.error(f"FFmpeg error: {process.stderr}")
+            returncode, stderr = _run_ffmpeg(cmd)
+            if returncode != 0:
+                logging.error(f"FFmpeg error: {stderr}")
                 return (output_path,)
             else:
                 logging.info(f"Subtitles extracted to: {output_path}")
@@ -391,9 +684,32 @@ class SubtitleExtractionNode:
         return (output_path,)
 
 
-class SubtitleEmbeddingNode:
+_SUBTITLE_EMBEDDING_INPUT_TYPES = {
+    "required": {
+        "video_path": ("STRING", {"multiline": False, "default": "video.mp4"}),
+        "subtitle_path": (
+            "STRING",
+            {"multiline": False, "default": "subtitles.srt"},
+        ),
+        "filename_prefix": (
+            "STRING",
+            {
+                "multiline": False,
+                "default": "video/embedded",
+                "tooltip": "Prefix for the output video file",
+            },
+        ),
+        "embed_method": (["soft", "hard"], {"default": "soft"}),
+    },
+    "optional": {
+        "settings": ("FFMPEG_SETTINGS",),
+    },
+}
 
+
+class SubtitleEmbeddingNode:
     def __init__(self):
+        self._out_dir = Path(folder_paths.get_output_directory())
         self.default_settings = {
             "format": "mkv",
             "codec": "copy",
@@ -404,31 +720,12 @@ class SubtitleEmbeddingNode:
             "preset": "medium",
             "crf": 20,
             "additional_params": "",
+            "hwaccel": "none",
         }
 
     @classmethod
     def INPUT_TYPES(s):
-        return {
-            "required": {
-                "video_path": ("STRING", {"multiline": False, "default": "video.mp4"}),
-                "subtitle_path": (
-                    "STRING",
-                    {"multiline": False, "default": "subtitles.srt"},
-                ),
-                "filename_prefix": (
-                    "STRING",
-                    {
-                        "multiline": False,
-                        "default": "video/embedded",
-                        "tooltip": "Prefix for the output video file",
-                    },
-                ),
-                "embed_method": (["soft", "hard"], {"default": "soft"}),
-            },
-            "optional": {
-                "settings": ("FFMPEG_SETTINGS",),
-            },
-        }
+        return _SUBTITLE_EMBEDDING_INPUT_TYPES
 
     RETURN_TYPES = ("STRING",)
     RETURN_NAMES = ("output_path",)
@@ -447,21 +744,14 @@ class SubtitleEmbeddingNode:
     ):
         if settings is None or settings == {}:
             settings = self.default_settings
-        video_basename = os.path.splitext(os.path.basename(video_path))[0]
-        if filename_prefix.strip() == "":
-            output_path = os.path.join(
-                folder_paths.get_output_directory(),
-                f"{video_basename}.{settings['format']}",
-            )
-        else:
-            output_path = os.path.join(
-                folder_paths.get_output_directory(),
-                f"{filename_prefix}_{video_basename}.{settings['format']}",
-            )
-        if not os.path.exists(os.path.dirname(output_path)):
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        if not os.path.exists(video_path):
-            logging.error(f"Error: Video file '{video_path}' not found")
+        video_basename = Path(video_path).stem
+        prefix = f"{filename_prefix}_" if filename_prefix.strip() else ""
+        output_file = self._out_dir / f"{prefix}{video_basename}.{settings['format']}"
+        output_path = str(output_file)
+
+        error = _validate_transcode(video_path, settings)
+        if error:
+            logging.error(f"Error: {error}")
             return (output_path,)
         if not os.path.exists(subtitle_path):
             logging.error(f"Error: Subtitle file '{subtitle_path}' not found")
@@ -469,88 +759,54 @@ class SubtitleEmbeddingNode:
         if embed_method not in ["soft", "hard"]:
             logging.error(f"Error: Invalid embed method '{embed_method}'")
             return (output_path,)
+        if embed_method == "soft" and settings["format"] != "mkv":
+            logging.error("Error: Soft embedding is only supported for MKV format.")
+            return (output_path,)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
 
         # Determine subtitle format based on file extension
         # subtitle_format = os.path.splitext(subtitle_path)[1][1:].lower()
 
-        if embed_method == "soft":
-            if settings["format"] != "mkv":
-                logging.error("Error: Soft embedding is only supported for MKV format.")
-                return (output_path,)
-            cmd = [
-                "ffmpeg",
-                "-y",
-                "-i",
-                video_path,
-                "-i",
-                subtitle_path,
-            ]
-
-            if settings["codec"] != "copy":
-                cmd += ["-c:v", settings["codec"]]
-                if settings["resolution"] != "source":
-                    cmd += ["-vf", f"scale={settings['resolution']}"]
-                if settings["framerate"] != "source":
-                    cmd += ["-r", settings["framerate"]]
-                if settings["preset"]:
-                    cmd += ["-preset", settings["preset"]]
-                if settings["crf"]:
-                    cmd += ["-crf", str(settings["crf"])]
-            else:
-                cmd += ["-c:v", "copy"]
+        try:
+            if embed_method == "soft":
+                options = _hwaccel_options(settings)
+                options += [("-i", video_path), ("-i", subtitle_path)]
 
-            if settings["audio_codec"] != "copy":
-                cmd += ["-c:a", settings["audio_codec"]]
-                if settings["audio_bitrate"] != "source":
-                    cmd += ["-b:a", settings["audio_bitrate"]]
-            else:
-                cmd += ["-c:a", "copy"]
+                if settings["codec"] != "copy":
+                    options += _video_encode_options(settings)
+                else:
+                    options.append(("-c:v", "copy"))
+                options += _audio_encode_options(settings)
 
-            if settings["additional_params"]:
-                cmd += settings["additional_params"].split()
+                cmd = list(_FFMPEG_CMD)
+                cmd.extend(itertools.chain.from_iterable(options))
+                if settings["additional_params"]:
+                    cmd += _split_params(settings["additional_params"])
+                cmd.append(output_path)
 
-            cmd.append(output_path)
+            elif embed_method == "hard":
+                # A second -vf would replace the first, so burn-in and scaling share one chain
+                vf_chain = [f"subtitles={_ff_filter_quote(subtitle_path)}"]
+                if settings["codec"] != "copy" and settings["resolution"] != "source":
+                    vf_chain.append(f"scale={settings['resolution']}")
+                options = [("-i", video_path), ("-vf", ",".join(vf_chain))]
 
-        elif embed_method == "hard":
-            subtitle_path = subtitle_path.replace("\\", "/")
-            subtitle_path = re.sub(r"(?<!\\):", r"\\:", subtitle_path)
-
-            cmd = [
-                "ffmpeg",
-                "-y",
-                "-i",
-                video_path,
-                "-vf",
-                f"subtitles='{subtitle_path}'",
-            ]
-
-            if settings["codec"] != "copy":
-                cmd += ["-c:v", settings["codec"]]
-                if settings["resolution"] != "source":
-                    cmd += ["-vf", f"scale={settings['resolution']}"]
-                if settings["framerate"] != "source":
-                    cmd += ["-r", settings["framerate"]]
-                if settings["preset"]:
-                    cmd += ["-preset", settings["preset"]]
-                if settings["crf"]:
-                    cmd += ["-crf", str(settings["crf"])]
-
-            if settings["audio_codec"] != "copy":
-                cmd += ["-c:a", settings["audio_codec"]]
-                if settings["audio_bitrate"] != "source":
-                    cmd += ["-b:a", settings["audio_bitrate"]]
+                if settings["codec"] != "copy":
+                    options += _video_encode_options(settings, scale=False)
 
-            cmd.append(output_path)
+                if settings["audio_codec"] != "copy":
+                    options += _audio_encode_options(settings)
+
+                cmd = list(_FFMPEG_CMD)
+                cmd.extend(itertools.chain.from_iterable(options))
+                cmd.append(output_path)
 
-        try:
             full_cmd = " ".join(cmd)
             logging.info(f"Running command: {full_cmd}")
-            process = subprocess.run(
-                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-            )
+            returncode, stderr = _run_ffmpeg(cmd)
 
-            if process.returncode != 0:
-                logging.error(f"FFmpeg error: {process.stderr}")
+            if returncode != 0:
+                logging.error(f"FFmpeg error: {stderr}")
                 return (output_path,)
             else:
                 logging.info(f"Subtitles embedded to: {output_path}")
@@ -560,63 +816,66 @@ class SubtitleEmbeddingNode:
             return (output_path,)
 
 
+_ASS_SUBTITLE_READER_INPUT_TYPES = {
+    "required": {
+        "ass_file_path": (
+            "STRING",
+            {"multiline": False, "default": "subtitles.ass"},
+        ),
+    },
+    "optional": {
+        "encoding": (
+            [
+                "utf-8",
+                "utf-8-sig",
+                "latin-1",
+                "cp1252",
+                "shift-jis",
+                "euc-jp",
+                "gbk",
+                "big5",
+            ],
+            {
+                "default": "utf-8",
+                "tooltip": "Character encoding of the ASS file",
+            },
+        ),
+        "max_lines": (
+            "INT",
+            {
+                "default": 0,
+                "min": 0,
+                "max": 10000,
+                "step": 1,
+                "tooltip": "Maximum number of lines to read (0 = all lines)",
+            },
+        ),
+        "filter_style": (
+            "STRING",
+            {
+                "multiline": False,
+                "default": "",
+                "tooltip": "Only include lines with this style name (leave empty for all styles)",
+            },
+        ),
+        "strip_formatting": (
+            ["True", "False"],
+            {
+                "default": "False",
+                "tooltip": "Remove ASS formatting codes from text",
+            },
+        ),
+    },
+}
+
+
 class ASSSubtitleReaderNode:
     def __init__(self):
         pass
 
     @classmethod
     def INPUT_TYPES(s):
-        return {
-            "required": {
-                "ass_file_path": (
-                    "STRING",
-                    {"multiline": False, "default": "subtitles.ass"},
-                ),
-            },
-            "optional": {
-                "encoding": (
-                    [
-                        "utf-8",
-                        "utf-8-sig",
-                        "latin-1",
-                        "cp1252",
-                        "shift-jis",
-                        "euc-jp",
-                        "gbk",
-                        "big5",
-                    ],
-                    {
-                        "default": "utf-8",
-                        "tooltip": "Character encoding of the ASS file",
-                    },
-                ),
-                "max_lines": (
-                    "INT",
-                    {
-                        "default": 0,
-                        "min": 0,
-                        "max": 10000,
-                        "step": 1,
-                        "tooltip": "Maximum number of lines to read (0 = all lines)",
-                    },
-                ),
-                "filter_style": (
-                    "STRING",
-                    {
-                        "multiline": False,
-                        "default": "",
-                        "tooltip": "Only include lines with this style name (leave empty for all styles)",
-                    },
-                ),
-                "strip_formatting": (
-                    ["True", "False"],
-                    {
-                        "default": "False",
-                        "tooltip": "Remove ASS formatting codes from text",
-                    },
-                ),
-            },
-        }
+        return _ASS_SUBTITLE_READER_INPUT_TYPES
 
     RETURN_TYPES = ("STRING", "STRING", "STRING")
     RETURN_NAMES = ("all_text", "dialog_only", "styles_info")
@@ -632,50 +891,64 @@ class ASSSubtitleReaderNode:
         filter_style="",
         strip_formatting="False",
     ):
-        if not os.path.exists(ass_file_path):
+        import mmap
+
+        # One stat both checks existence and catches empty files, which can't be mapped
+        try:
+            file_size = os.path.getsize(ass_file_path)
+        except FileNotFoundError:
             logging.error(f"Error: ASS file '{ass_file_path}' not found")
             return ("", "", "")
+        except OSError as e:
+            logging.error(f"Error reading ASS file: {str(e)}")
+            return (f"Error: {str(e)}", "", "")
+        if file_size == 0:
+            return ("", "", "")
         try:
-            with open(ass_file_path, "r", encoding=encoding) as file:
-                content = file.read()
-
-            # Parse sections
-            current_section = None
-            dialog_lines = []
-            styles_info = []
-
-            for line in content.splitlines():
-                line = line.strip()
-                # Track sections
-                if line.startswith("[") and line.endswith("]"):
-                    current_section = line[1:-1]
-                    continue
-
-                # Process dialog lines
-                if current_section == "Events" and line.startswith("Dialogue:"):
-                    parts = line.split(",", 9)
-                    if len(parts) >= 10:
-                        style = parts[3].strip()
-                        text = parts[9].strip()
-
-                        # Apply filters
-                        if filter_style and style != filter_style:
-                            continue
-
-                        # Strip formatting if requested
-                        if strip_formatting == "True":
-                            # Remove ASS formatting codes like {\\...}
-                            text = re.sub(r"{\\[^}]*}", "", text)
-
-                        dialog_lines.append(text)
-
-                # Collect styles information
-                if current_section == "V4+ Styles" and line.startswith("Style:"):
-                    styles_info.append(line)
-
-            # Apply max_lines limit if set
-            if max_lines > 0:
-                dialog_lines = dialog_lines[:max_lines]
+            with open(ass_file_path, "rb") as file, mmap.mmap(
+                file.fileno(), 0, access=mmap.ACCESS_READ
+            ) as mm:
+                # Split into sections, each running until the next [Section] header
+                headers = list(_ASS_SECTION_RE.finditer(mm))
+                sections = [
+                    (
+                        header.group(1),
+                        header.end(),
+                        headers[i + 1].start() if i + 1 < len(headers) else len(mm),
+                    )
+                    for i, header in enumerate(headers)
+                ]
+
+                # Dialog lines from [Events], filtered by style, stopping at max_lines
+                matches = (
+                    match
+                    for name, start, end in sections
+                    if name == b"Events"
+                    for match in _ASS_DIALOGUE_RE.finditer(mm, start, end)
+                    if not filter_style
+                    or match.group(1).decode(encoding).strip() == filter_style
+                )
+                # Closing releases the pending scanner so the mmap can be closed
+                with contextlib.closing(matches):
+                    dialog_lines = [
+                        match.group(2).decode(encoding).strip()
+                        for match in itertools.islice(matches, max_lines or None)
+                    ]
+                if strip_formatting == "True":
+                    dialog_lines = [_ASS_FMT_RE.sub("", text) for text in dialog_lines]
+
+                # Styles information from [V4+ Styles]
+                styles_info = [
+                    match.group(1).decode(encoding)
+                    for name, start, end in sections
+                    if name == b"V4+ Styles"
+                    for match in _ASS_STYLE_RE.finditer(mm, start, end)
+                ]
+
+                content = str(mm, encoding)
+            if "\r" in content:
+                # Same newline translation as reading in text mode
+                content = content.replace("\r\n", "\n").replace("\r", "\n")
 
             dialog_text = "\n".join(dialog_lines)
             styles_text = "\n".join(styles_info)
@@ -687,44 +960,50 @@ class ASSSubtitleReaderNode:
             return (f"Error: {str(e)}", "", "")
 
 
+_ASS_SUBTITLE_SAVE_INPUT_TYPES = {
+    "required": {
+        "subtitle_text": ("STRING", {"multiline": True, "default": ""}),
+        "filename_prefix": (
+            "STRING",
+            {"multiline": False, "default": "subs/ComfyUI"},
+        ),
+        "format": (
+            ["ass", "srt"],
+            {"default": "ass", "tooltip": "Subtitle format"},
+        ),
+    },
+    "optional": {
+        "encoding": (
+            [
+                "utf-8",
+                "utf-8-sig",
+                "latin-1",
+                "cp1252",
+                "shift-jis",
+                "euc-jp",
+                "gbk",
+                "big5",
+            ],
+            {
+                "default": "utf-8",
+                "tooltip": "Character encoding for the subtitle file",
+            },
+        ),
+    },
+}
+
+
 class ASSSubtitleSaveNode:
     """
     Save received string to subtitle file (.ass or .srt).
     """
 
+    def __init__(self):
+        self._out_dir = Path(folder_paths.get_output_directory())
+
     @classmethod
     def INPUT_TYPES(s):
-        return {
-            "required": {
-                "subtitle_text": ("STRING", {"multiline": True, "default": ""}),
-                "filename_prefix": (
-                    "STRING",
-                    {"multiline": False, "default": "subs/ComfyUI"},
-                ),
-                "format": (
-                    ["ass", "srt"],
-                    {"default": "ass", "tooltip": "Subtitle format"},
-                ),
-            },
-            "optional": {
-                "encoding": (
-                    [
-                        "utf-8",
-                        "utf-8-sig",
-                        "latin-1",
-                        "cp1252",
-                        "shift-jis",
-                        "euc-jp",
-                        "gbk",
-                        "big5",
-                    ],
-                    {
-                        "default": "utf-8",
-                        "tooltip": "Character encoding for the subtitle file",
-                    },
-                ),
-            },
-        }
+        return _ASS_SUBTITLE_SAVE_INPUT_TYPES
 
     RETURN_TYPES = ("STRING",)
     RETURN_NAMES = ("filepath",)
@@ -738,40 +1017,51 @@ class ASSSubtitleSaveNode:
     def save_subtitle(
         self, subtitle_text, filename_prefix, format="ass", encoding="utf-8"
     ):
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        import time
+
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
         filename = f"{filename_prefix}_{timestamp}.{format}"
 
         # Create full filepath in cache directory
-        filepath = os.path.join(folder_paths.get_output_directory(), filename)
-        if not os.path.exists(os.path.dirname(filepath)):
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        output_file = self._out_dir / filename
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        filepath = str(output_file)
+        tmp_filepath = filepath + ".tmp"
         try:
-            with open(filepath, mode="w", encoding=encoding) as f:
-                f.write(subtitle_text)
+            data = subtitle_text.encode(encoding)
+            # Write to a temporary file first so a crash never leaves a partial file
+            with open(tmp_filepath, mode="wb") as f:
+                f.write(data)
+            os.replace(tmp_filepath, filepath)
 
             logging.info(f"Subtitle saved to: {filepath}")
             return (filepath,)
 
         except Exception as e:
             logging.error(f"Error saving {format} file: {str(e)}")
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_filepath)
             return (filepath,)
 
 
+_MULTILINE_TEXT_INPUT_TYPES = {
+    "required": {
+        "text": (
+            "STRING",
+            {
+                "multiline": True,
+                "default": "",
+                "placeholder": "Enter your text here...",
+            },
+        ),
+    },
+}
+
+
 class MultilineTextInputNode:
     @classmethod
     def INPUT_TYPES(s):
-        return {
-            "required": {
-                "text": (
-                    "STRING",
-                    {
-                        "multiline": True,
-                        "default": "",
-                        "placeholder": "Enter your text here...",
-                    },
-                ),
-            },
-        }
+        return _MULTILINE_TEXT_INPUT_TYPES
 
     RETURN_TYPES = ("STRING",)
     RETURN_NAMES = ("text",)
@@ -790,6 +1080,7 @@ class MultilineTextInputNode:
 NODE_CLASS_MAPPINGS = {
     "FFMpegSettings": FFMpegSettingsNode,
     "VideoTranscoding": VideoTranscodingNode,
+    "BatchVideoTranscoding": BatchVideoTranscodingNode,
     "SubtitleExtraction": SubtitleExtractionNode,
     "SubtitleEmbedding": SubtitleEmbeddingNode,
     "ASSSubtitleReader": ASSSubtitleReaderNode,
@@ -801,6 +1092,7 @@ NODE_CLASS_MAPPINGS = {
 NODE_DISPLAY_NAME_MAPPINGS = {
     "FFMpegSettings": "FFmpeg settings",
     "VideoTranscoding": "Video transcoding",
+    "BatchVideoTranscoding": "Batch video transcoding",
     "SubtitleExtraction": "Subtitle extraction",
     "SubtitleEmbedding": "Subtitle embedding",
     "ASSSubtitleReader": "Load ASS subtitles",
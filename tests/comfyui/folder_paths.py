@@ -0,0 +1,11 @@
+"""Minimal stand-in for ComfyUI's folder_paths module, used when testing outside ComfyUI."""
+
+import tempfile
+
+
+def get_output_directory():
+    return tempfile.gettempdir()
+
+
+def get_temp_directory():
+    return tempfile.gettempdir()
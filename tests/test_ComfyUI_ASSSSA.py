@@ -2,20 +2,89 @@
 
 """Tests for `ComfyUI_ASSSSA` package."""
 
+from pathlib import Path
+
 import pytest
-from src.ComfyUI_ASSSSA.nodes import Example
+from src.ComfyUI_ASSSSA.nodes import (
+    BatchVideoTranscodingNode,
+    NODE_CLASS_MAPPINGS,
+    NODE_DISPLAY_NAME_MAPPINGS,
+    FFMpegSettingsNode,
+    MultilineTextInputNode,
+    SubtitleEmbeddingNode,
+    _ff_filter_quote,
+    _split_params,
+    _validate_transcode,
+)
 
 @pytest.fixture
-def example_node():
-    """Fixture to create an Example node instance."""
-    return Example()
+def text_node():
+    """Fixture to create a MultilineTextInput node instance."""
+    return MultilineTextInputNode()
 
-def test_example_node_initialization(example_node):
+def test_text_node_initialization(text_node):
     """Test that the node can be instantiated."""
-    assert isinstance(example_node, Example)
+    assert isinstance(text_node, MultilineTextInputNode)
 
 def test_return_types():
     """Test the node's metadata."""
-    assert Example.RETURN_TYPES == ("IMAGE",)
-    assert Example.FUNCTION == "test"
-    assert Example.CATEGORY == "Example"
+    assert MultilineTextInputNode.RETURN_TYPES == ("STRING",)
+    assert MultilineTextInputNode.FUNCTION == "process_text"
+    assert MultilineTextInputNode.CATEGORY == "ComfyUI_ASSSSA"
+
+def test_node_mappings():
+    """Test that every node has a display name and a valid entry point."""
+    assert NODE_CLASS_MAPPINGS.keys() == NODE_DISPLAY_NAME_MAPPINGS.keys()
+    for node in NODE_CLASS_MAPPINGS.values():
+        assert "required" in node.INPUT_TYPES()
+        assert callable(getattr(node, node.FUNCTION))
+
+def test_ffmpeg_settings_widget_order():
+    """New inputs go last, saved workflows map widget values by position."""
+    optional = list(FFMpegSettingsNode.INPUT_TYPES()["optional"])
+    assert optional[:3] == ["audio_codec", "audio_bitrate", "additional_params"]
+
+def test_batch_outputs_are_distinct(tmp_path):
+    """Inputs sharing a name, in any case, get numbered output files."""
+    paths = [tmp_path / "a" / "clip.mp4", tmp_path / "b" / "Clip.mp4", tmp_path / "clip_1.mp4"]
+    settings = dict(SubtitleEmbeddingNode().default_settings, format="mp4")
+    (output_paths,) = BatchVideoTranscodingNode().transcode_videos("\n".join(map(str, paths)), "p", settings)
+    names = [Path(path).name for path in output_paths.splitlines()]
+    assert names == ["p_clip.mp4", "p_Clip_1.mp4", "p_clip_1_1.mp4"]
+
+@pytest.mark.parametrize(
+    "codec, format, ok",
+    [("libx264", "mxf", True), ("libx265", "mxf", False), ("hevc_nvenc", "flv", False), ("libvpx-vp9", "mov", False)],
+)
+def test_codec_container_validation(tmp_path, codec, format, ok):
+    """Impossible codec and container pairs are rejected before running ffmpeg."""
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"")
+    error = _validate_transcode(str(video), {"codec": codec, "format": format})
+    assert (error is None) == ok
+
+def test_split_params_keeps_quoted_arguments():
+    """Quoted arguments containing spaces reach ffmpeg as one argument, without the quotes."""
+    params = """-vf "drawtext=text='hello world'" -metadata title="a b" -attach 'C:\\fonts\\my font.ttf'"""
+    assert _split_params(params) == [
+        "-vf",
+        "drawtext=text='hello world'",
+        "-metadata",
+        "title=a b",
+        "-attach",
+        "C:\\fonts\\my font.ttf",
+    ]
+
+def test_ff_filter_quote():
+    """Subtitle paths are escaped for the filter option parser, then quoted for the filtergraph."""
+    assert _ff_filter_quote("C:\\a b,c'd.ass") == "'C\\:/a b,c\\'\\''d.ass'"
+
+def test_embed_rejects_unbalanced_additional_params(tmp_path):
+    """Unparseable additional parameters are logged, not raised."""
+    video = tmp_path / "video.mkv"
+    subtitles = tmp_path / "subtitles.ass"
+    video.write_bytes(b"")
+    subtitles.write_bytes(b"")
+    settings = dict(SubtitleEmbeddingNode().default_settings, additional_params='-metadata title="x')
+    (output_path,) = SubtitleEmbeddingNode().embed_subtitles(str(video), str(subtitles), "", "soft", settings)
+    assert output_path.endswith("video.mkv")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+"""Tests for `ASSSubtitleReaderNode`, pinned to the original per-line parser."""
+
+import pytest
+from src.ComfyUI_ASSSSA.nodes import ASSSubtitleReaderNode
+
+LINES = [
+    "[Script Info]",
+    "Title: x",
+    "Dialogue: 0,0,0,Default,,0,0,0,,outside events",
+    "",
+    "[V4+ Styles]",
+    "Format: Name, Fontname",
+    "Style: Default,Arial",
+    "  Style: Sign,Arial  ",
+    "",
+    "[Events]",
+    "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    "Dialogue: 0,0:00:01.00,0:00:02.00,Default,,0,0,0,,{\\b1}Hello, world{\\b0}",
+    "Dialogue: 0,0:00:03.00,0:00:04.00,Sign,,0,0,0,,Sign text  ",
+    "  Dialogue: 0,0:00:05.00,0:00:06.00,Default,,0,0,0,,日本語",
+    "Comment: 0,0:00:05.00,0:00:06.00,Default,,0,0,0,,comment",
+    "Dialogue: bad,line",
+    "",
+]
+DIALOG = ["{\\b1}Hello, world{\\b0}", "Sign text", "日本語"]
+STYLES = "Style: Default,Arial\nStyle: Sign,Arial"
+
+@pytest.fixture
+def reader():
+    """Fixture to create an ASSSubtitleReader node instance."""
+    return ASSSubtitleReaderNode()
+
+@pytest.fixture
+def write_ass(tmp_path):
+    """Fixture writing LINES with the given newline and encoding."""
+    def write(newline="\n", encoding="utf-8", extra=b""):
+        path = tmp_path / "subtitles.ass"
+        path.write_bytes(newline.join(LINES).encode(encoding) + extra)
+        return str(path)
+    return write
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "shift-jis"])
+def test_line_endings_and_encodings(reader, write_ass, newline, encoding):
+    """Any line ending is accepted and all_text is newline normalised."""
+    path = write_ass(newline, encoding)
+    assert reader.read_ass(path, encoding) == ("\n".join(LINES), "\n".join(DIALOG), STYLES)
+
+def test_strip_formatting(reader, write_ass):
+    """Formatting codes are removed from dialog lines."""
+    _, dialog, _ = reader.read_ass(write_ass(), strip_formatting="True")
+    assert dialog.split("\n") == ["Hello, world", "Sign text", "日本語"]
+
+@pytest.mark.parametrize(
+    "filter_style, max_lines, expected",
+    [
+        ("Default", 0, [DIALOG[0], DIALOG[2]]),
+        ("Default", 1, [DIALOG[0]]),
+        ("Sign", 5, [DIALOG[1]]),
+        ("", 2, DIALOG[:2]),
+        ("Missing", 0, []),
+    ],
+)
+def test_filter_style_and_max_lines(reader, write_ass, filter_style, max_lines, expected):
+    """Style filtering is applied before the max_lines limit."""
+    _, dialog, _ = reader.read_ass(write_ass("\r\n"), max_lines=max_lines, filter_style=filter_style)
+    assert dialog == "\n".join(expected)
+
+def test_invalid_bytes_report_decode_error(reader, write_ass):
+    """Undecodable text is reported as the decode error, not an mmap error."""
+    path = write_ass(extra=b"Dialogue: 0,0,0,Default,,0,0,0,,\xff\xfe bad\n")
+    all_text, dialog, styles = reader.read_ass(path)
+    assert all_text.startswith("Error: 'utf-8' codec can't decode byte 0xff")
+    assert (dialog, styles) == ("", "")
+
+def test_missing_and_empty_files(reader, tmp_path):
+    """Missing and empty files return empty strings."""
+    assert reader.read_ass(str(tmp_path / "missing.ass")) == ("", "", "")
+    empty = tmp_path / "empty.ass"
+    empty.write_bytes(b"")
+    assert reader.read_ass(str(empty)) == ("", "", "")